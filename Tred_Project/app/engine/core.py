@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import asyncio
+import copy
 import inspect
-import uuid
+import json
+import os
+from collections import ChainMap, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Any, Awaitable, Callable, Dict, List, Optional
+from typing import Any, Callable, Coroutine, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
 
 
 class ToolRegistry:
@@ -12,39 +16,53 @@ class ToolRegistry:
 
     def __init__(self) -> None:
         self._tools: Dict[str, Callable[..., Any]] = {}
+        self._sorted_names: Optional[Tuple[str, ...]] = None
 
     def register(self, name: str, fn: Callable[..., Any]) -> None:
         self._tools[name] = fn
+        self._sorted_names = None
 
     def get(self, name: str) -> Callable[..., Any]:
-        if name not in self._tools:
-            raise KeyError(f"Tool '{name}' is not registered")
-        return self._tools[name]
+        try:
+            return self._tools[name]
+        except KeyError:
+            raise KeyError(f"Tool '{name}' is not registered") from None
 
-    def list_tools(self) -> List[str]:
-        return sorted(self._tools.keys())
+    def list_tools(self) -> Tuple[str, ...]:
+        if self._sorted_names is None:
+            self._sorted_names = tuple(sorted(self._tools))
+        return self._sorted_names
 
 
-@dataclass
+@dataclass(slots=True)
 class NodeResult:
-    state: Dict[str, Any]
+    state: Mapping[str, Any]
     next_node: Optional[str] = None
     log: Optional[str] = None
 
 
-NodeCallable = Callable[[Dict[str, Any], ToolRegistry], Awaitable[NodeResult] | NodeResult]
+# Coroutine functions are awaited; any other node must return its result directly.
+NodeOutput = NodeResult | Dict[str, Any]
+NodeCallable = (
+    Callable[[Mapping[str, Any], ToolRegistry], NodeOutput]
+    | Callable[[Mapping[str, Any], ToolRegistry], Coroutine[Any, Any, NodeOutput]]
+)
 
 
-@dataclass
+@dataclass(slots=True)
 class GraphDefinition:
     graph_id: str
     nodes: Dict[str, NodeCallable]
     edges: Dict[str, List[str]]
     start_node: str
     description: Optional[str] = None
+    # Derived from ``edges``: the single default successor of each node (absent
+    # when it has none) and the nodes with several edges that must pick one.
+    linear_next: Dict[str, str] = field(default_factory=dict)
+    branch_nodes: FrozenSet[str] = frozenset()
 
 
-@dataclass
+@dataclass(slots=True)
 class GraphRunRecord:
     run_id: str
     graph_id: str
@@ -55,111 +73,205 @@ class GraphRunRecord:
     error: Optional[str] = None
 
 
+def _state_key(state: Mapping[str, Any], keys: Tuple[str, ...]) -> str:
+    return json.dumps({k: state[k] for k in keys if k in state}, sort_keys=True, default=str)
+
+
+def _written_layer(result_state: Mapping[str, Any], state: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return the keys a node wrote if it layered them over ``state`` with a ChainMap."""
+    if not isinstance(result_state, ChainMap):
+        return None
+    parents = state.maps if isinstance(state, ChainMap) else [state]
+    if len(result_state.maps) != len(parents) + 1 or any(a is not b for a, b in zip(result_state.maps[1:], parents)):
+        return None
+    return result_state.maps[0]
+
+
 class GraphEngine:
     """In-memory graph storage and executor."""
 
-    def __init__(self, node_library: Dict[str, NodeCallable], tool_registry: ToolRegistry):
+    NODE_CACHE_SIZE = 1024
+    MAX_FINISHED_RUNS = 10_000
+    # Nodes may return a ChainMap layered over their input; flatten once it gets
+    # this deep so key lookups stay cheap in long loops.
+    MAX_STATE_DEPTH = 32
+
+    def __init__(
+        self,
+        node_library: Dict[str, NodeCallable],
+        tool_registry: ToolRegistry,
+        memoized_nodes: Optional[Mapping[str, Iterable[str]]] = None,
+        inline_nodes: Optional[Iterable[str]] = None,
+        max_concurrent_runs: int = 16,
+    ):
         self._graphs: Dict[str, GraphDefinition] = {}
-        self._runs: Dict[str, GraphRunRecord] = {}
+        # Runs in progress are mutated under ``_lock``; finished runs are written
+        # once and the least recently read are evicted past MAX_FINISHED_RUNS.
+        # Reads of either take no lock since the event loop is single-threaded.
+        self._active_runs: Dict[str, GraphRunRecord] = {}
+        self._finished_runs: OrderedDict[str, GraphRunRecord] = OrderedDict()
         self._lock = asyncio.Lock()
         self._node_library = node_library
+        self._node_names = tuple(sorted(node_library))
+        self._is_async = {name: inspect.iscoroutinefunction(fn) for name, fn in node_library.items()}
         self._tool_registry = tool_registry
+        # Memoized nodes name the state keys they read; the cache is keyed on just
+        # those and holds a private copy of the layer each node wrote.
+        self._memoized_nodes = {name: tuple(keys) for name, keys in (memoized_nodes or {}).items()}
+        self._node_cache: Dict[Tuple[str, str], NodeResult] = {}
+        # Synchronous nodes run on this pool so they don't block the event loop,
+        # except the ones listed in ``inline_nodes`` which are too cheap to bother.
+        self._inline_nodes = frozenset(inline_nodes or ())
+        self._executor = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+        # Runs beyond this limit wait before allocating any state.
+        self._run_sem = asyncio.Semaphore(max_concurrent_runs)
 
     async def register_graph(
         self, nodes: List[str], edges: Dict[str, List[str]], start_node: str, description: Optional[str] = None
     ) -> str:
+        graph_id = os.urandom(16).hex()
         async with self._lock:
-            graph_id = str(uuid.uuid4())
             node_map = {}
             for name in nodes:
                 if name not in self._node_library:
-                    raise ValueError(f"Unknown node '{name}'. Available: {sorted(self._node_library.keys())}")
+                    raise ValueError(f"Unknown node '{name}'. Available: {list(self._node_names)}")
                 node_map[name] = self._node_library[name]
             if start_node not in node_map:
                 raise ValueError(f"Start node '{start_node}' must be in nodes list")
-            normalized_edges = {k: (v if isinstance(v, list) else [v]) for k, v in edges.items()}
+            assert all(isinstance(v, list) for v in edges.values()), "edges must map node names to lists"
             self._graphs[graph_id] = GraphDefinition(
                 graph_id=graph_id,
                 nodes=node_map,
-                edges=normalized_edges,
+                edges=edges,
                 start_node=start_node,
                 description=description,
+                linear_next={k: v[0] for k, v in edges.items() if len(v) == 1},
+                branch_nodes=frozenset(k for k, v in edges.items() if len(v) > 1),
             )
+            self._node_cache.clear()
             return graph_id
 
-    async def run_graph(self, graph_id: str, initial_state: Dict[str, Any]) -> GraphRunRecord:
+    async def run_graph(
+        self, graph_id: str, initial_state: Dict[str, Any], full_snapshots: bool = False
+    ) -> GraphRunRecord:
+        async with self._run_sem:
+            return await self._run_graph(graph_id, initial_state, full_snapshots)
+
+    async def _run_graph(self, graph_id: str, initial_state: Dict[str, Any], full_snapshots: bool) -> GraphRunRecord:
+        run_id = os.urandom(16).hex()
         async with self._lock:
-            if graph_id not in self._graphs:
-                raise KeyError(f"Graph '{graph_id}' not found")
-            run_id = str(uuid.uuid4())
+            try:
+                graph = self._graphs[graph_id]
+            except KeyError:
+                raise KeyError(f"Graph '{graph_id}' not found") from None
             run = GraphRunRecord(
                 run_id=run_id, graph_id=graph_id, current_state=dict(initial_state), status="running", current_node=None
             )
-            self._runs[run_id] = run
+            self._active_runs[run_id] = run
 
         try:
-            final_state, logs = await self._execute(self._graphs[graph_id], initial_state)
+            final_state, logs = await self._execute(graph, initial_state, full_snapshots)
             async with self._lock:
                 run.status = "completed"
                 run.current_state = final_state
                 run.logs = logs
                 run.current_node = None
+                self._finish_run(run)
             return run
         except Exception as exc:  # pylint: disable=broad-except
             async with self._lock:
                 run.status = "failed"
                 run.error = str(exc)
+                self._finish_run(run)
             raise
 
-    async def _execute(self, graph: GraphDefinition, state: Dict[str, Any]) -> tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    def _finish_run(self, run: GraphRunRecord) -> None:
+        self._finished_runs[run.run_id] = run
+        self._active_runs.pop(run.run_id, None)
+        if len(self._finished_runs) > self.MAX_FINISHED_RUNS:
+            self._finished_runs.popitem(last=False)
+
+    async def _execute(
+        self, graph: GraphDefinition, state: Dict[str, Any], full_snapshots: bool = False
+    ) -> tuple[Dict[str, Any], List[Dict[str, Any]]]:
         logs: List[Dict[str, Any]] = []
         current_node = graph.start_node
-        current_state = dict(state)
+        current_state: Mapping[str, Any] = dict(state)
 
         while current_node:
             node_fn = graph.nodes[current_node]
-            result = await self._run_node(node_fn, current_state)
-
-            log_entry = {
-                "node": current_node,
-                "log": result.log,
-                "state_snapshot": result.state,
-            }
+            result = await self._run_node(current_node, node_fn, current_state)
+
+            log_entry: Dict[str, Any] = {"node": current_node, "log": result.log}
+            if full_snapshots:
+                log_entry["state_snapshot"] = dict(result.state)
+            else:
+                log_entry["state_delta"] = {
+                    k: v for k, v in result.state.items() if k not in current_state or current_state[k] is not v
+                }
             logs.append(log_entry)
 
             current_state = result.state
+            if isinstance(current_state, ChainMap) and len(current_state.maps) > self.MAX_STATE_DEPTH:
+                current_state = dict(current_state)
             if result.next_node is not None:
                 current_node = result.next_node
                 continue
 
-            next_candidates = graph.edges.get(current_node, [])
-            if len(next_candidates) > 1:
+            if current_node in graph.branch_nodes:
                 raise ValueError(f"Node '{current_node}' has multiple edges but no next_node provided by the node logic")
-            current_node = next_candidates[0] if next_candidates else None
-
-        return current_state, logs
-
-    async def _run_node(self, fn: NodeCallable, state: Dict[str, Any]) -> NodeResult:
-        result = fn(state, self._tool_registry)
-        if inspect.isawaitable(result):
-            result = await result
+            current_node = graph.linear_next.get(current_node)
+
+        return dict(current_state), logs
+
+    async def _run_node(self, name: str, fn: NodeCallable, state: Mapping[str, Any]) -> NodeResult:
+        input_keys = self._memoized_nodes.get(name)
+        if input_keys is None:
+            return await self._call_node(name, fn, state)
+        key = (name, _state_key(state, input_keys))
+        cached = self._node_cache.get(key)
+        if cached is None:
+            result = await self._call_node(name, fn, state)
+            layer = _written_layer(result.state, state)
+            if layer is not None:
+                if len(self._node_cache) >= self.NODE_CACHE_SIZE:
+                    del self._node_cache[next(iter(self._node_cache))]
+                self._node_cache[key] = NodeResult(
+                    state=copy.deepcopy(layer), next_node=result.next_node, log=result.log
+                )
+            return result
+        changes = copy.deepcopy(cached.state)
+        new_state = state.new_child(changes) if isinstance(state, ChainMap) else ChainMap(changes, state)
+        return NodeResult(state=new_state, next_node=cached.next_node, log=cached.log)
+
+    async def _call_node(self, name: str, fn: NodeCallable, state: Mapping[str, Any]) -> NodeResult:
+        if self._is_async[name]:
+            result = await fn(state, self._tool_registry)
+        elif name in self._inline_nodes:
+            result = fn(state, self._tool_registry)
+        else:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, fn, state, self._tool_registry)
         if isinstance(result, NodeResult):
             return result
         if isinstance(result, dict):
             return NodeResult(state=result)
         raise TypeError("Node must return NodeResult or dict")
 
-    async def get_run(self, run_id: str) -> GraphRunRecord:
-        async with self._lock:
-            if run_id not in self._runs:
-                raise KeyError(f"Run '{run_id}' not found")
-            return self._runs[run_id]
+    def get_run(self, run_id: str) -> GraphRunRecord:
+        run = self._finished_runs.get(run_id)
+        if run is not None:
+            self._finished_runs.move_to_end(run_id)
+            return run
+        run = self._active_runs.get(run_id)
+        if run is None:
+            raise KeyError(f"Run '{run_id}' not found")
+        return run
 
     def list_graphs(self) -> List[str]:
         return list(self._graphs.keys())
 
-    def list_nodes(self) -> List[str]:
-        return sorted(self._node_library.keys())
+    def list_nodes(self) -> Tuple[str, ...]:
+        return self._node_names
 
     def describe_graphs(self) -> List[Dict[str, Any]]:
         return [
@@ -1,29 +1,37 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Union
+import os
+from typing import Any, Dict, List, Optional
 
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 from app.engine.core import GraphEngine, ToolRegistry
-from app.workflows.code_review import NODE_LIBRARY
+from app.workflows.code_review import INLINE_NODES, MEMOIZED_NODES, NODE_LIBRARY, scan_code
 
 
 def detect_smells_tool(code: str) -> Dict[str, Any]:
     """Tiny heuristic smell detector."""
-    long_lines = [line for line in code.splitlines() if len(line) > 120]
-    todo_comments = [line for line in code.splitlines() if "TODO" in line]
-    return {"issues": len(long_lines) + len(todo_comments), "long_lines": len(long_lines), "todos": len(todo_comments)}
+    scan = scan_code(code)
+    long_lines, todos = scan["long_lines"], scan["todos"]
+    return {"issues": long_lines + todos, "long_lines": long_lines, "todos": todos}
 
 
 class GraphCreateRequest(BaseModel):
     nodes: List[str] = Field(..., description="Names of nodes to include, must exist in the node library")
-    edges: Dict[str, Union[str, List[str]]] = Field(
+    edges: Dict[str, List[str]] = Field(
         ..., description="Mapping of node -> next node(s). For branching, nodes decide via `next_node`."
     )
     start_node: str
     description: Optional[str] = None
 
+    @field_validator("edges", mode="before")
+    @classmethod
+    def _normalize_edges(cls, value: Any) -> Any:
+        if not isinstance(value, dict):
+            return value
+        return {k: (v if isinstance(v, list) else [v]) for k, v in value.items()}
+
 
 class GraphCreateResponse(BaseModel):
     graph_id: str
@@ -51,8 +59,15 @@ class GraphStateResponse(BaseModel):
 
 tool_registry = ToolRegistry()
 tool_registry.register("detect_smells", detect_smells_tool)
-
-engine = GraphEngine(node_library=NODE_LIBRARY, tool_registry=tool_registry)
+tool_registry.register("scan_code", scan_code)
+
+engine = GraphEngine(
+    node_library=NODE_LIBRARY,
+    tool_registry=tool_registry,
+    memoized_nodes=MEMOIZED_NODES,
+    inline_nodes=INLINE_NODES,
+    max_concurrent_runs=int(os.getenv("MAX_CONCURRENT_RUNS", "16")),
+)
 app = FastAPI(title="Minimal Workflow Engine", version="0.1.0")
 
 
@@ -79,7 +94,7 @@ async def startup_event() -> None:
 async def create_graph(request: GraphCreateRequest) -> GraphCreateResponse:
     try:
         graph_id = await engine.register_graph(
-            nodes=request.nodes, edges={k: v if isinstance(v, list) else [v] for k, v in request.edges.items()}, start_node=request.start_node, description=request.description
+            nodes=request.nodes, edges=request.edges, start_node=request.start_node, description=request.description
         )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -87,9 +102,11 @@ async def create_graph(request: GraphCreateRequest) -> GraphCreateResponse:
 
 
 @app.post("/graph/run", response_model=GraphRunResponse)
-async def run_graph(request: GraphRunRequest) -> GraphRunResponse:
+async def run_graph(request: GraphRunRequest, full_snapshots: bool = False) -> GraphRunResponse:
     try:
-        run = await engine.run_graph(graph_id=request.graph_id, initial_state=request.initial_state)
+        run = await engine.run_graph(
+            graph_id=request.graph_id, initial_state=request.initial_state, full_snapshots=full_snapshots
+        )
     except KeyError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
     except Exception as exc:  # pylint: disable=broad-except
@@ -100,7 +117,7 @@ async def run_graph(request: GraphRunRequest) -> GraphRunResponse:
 @app.get("/graph/state/{run_id}", response_model=GraphStateResponse)
 async def get_state(run_id: str) -> GraphStateResponse:
     try:
-        run = await engine.get_run(run_id)
+        run = engine.get_run(run_id)
     except KeyError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
     return GraphStateResponse(
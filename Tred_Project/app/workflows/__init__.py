@@ -1,6 +1,6 @@
 """Predefined workflow nodes."""
 
-from app.workflows.code_review import NODE_LIBRARY
+from app.workflows.code_review import INLINE_NODES, MEMOIZED_NODES, NODE_LIBRARY, scan_code
 
-__all__ = ["NODE_LIBRARY"]
+__all__ = ["INLINE_NODES", "MEMOIZED_NODES", "NODE_LIBRARY", "scan_code"]
 
@@ -1,44 +1,80 @@
 from __future__ import annotations
 
+import hashlib
 import re
-from typing import Any, Dict, List
+import sys
+import threading
+from collections import ChainMap
+from typing import Any, Dict, List, Mapping, Tuple
 
 from app.engine.core import NodeResult, ToolRegistry
 
+_FUNC_RE = re.compile(r"def\s+([a-zA-Z_][a-zA-Z0-9_]*)")
+# Matches from a TODO to the end of its line (same separators as str.splitlines()),
+# so each match is one line containing a TODO.
+_TODO_LINE_RE = re.compile("TODO[^\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]*")
 
-def _extract_functions_from_code(code: str) -> List[str]:
-    pattern = r"def\\s+([a-zA-Z_][a-zA-Z0-9_]*)"
-    return re.findall(pattern, code)
+# scan_code results keyed by a digest of the source, so cached entries never pin
+# the (possibly multi-MB) source strings themselves. Nodes call scan_code from
+# the engine's thread pool, hence the lock.
+_SCAN_CACHE_SIZE = 1024
+_scan_cache: Dict[bytes, Tuple[Tuple[str, ...], int, int]] = {}
+_scan_lock = threading.Lock()
 
 
-def extract_functions(state: Dict[str, Any], tools: ToolRegistry) -> NodeResult:
-    code = state.get("code", "")
-    functions = _extract_functions_from_code(code)
-    new_state = dict(state)
-    new_state["functions"] = functions
-    new_state["function_count"] = len(functions)
+def _extract_functions_from_code(code: str) -> List[str]:
+    return [sys.intern(name) for name in _FUNC_RE.findall(code)]
+
+
+def scan_code(code: str) -> Dict[str, Any]:
+    """Collect function names and smell counts for ``code`` in one cached scan."""
+    digest = hashlib.blake2b(code.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _scan_lock:
+        cached = _scan_cache.get(digest)
+    if cached is None:
+        long_lines = len([line for line in code.splitlines() if len(line) > 120])
+        todos = sum(1 for _ in _TODO_LINE_RE.finditer(code))
+        cached = (tuple(_extract_functions_from_code(code)), long_lines, todos)
+        with _scan_lock:
+            if len(_scan_cache) >= _SCAN_CACHE_SIZE:
+                del _scan_cache[next(iter(_scan_cache))]
+            _scan_cache[digest] = cached
+    functions, long_lines, todos = cached
+    return {"functions": functions, "long_lines": long_lines, "todos": todos}
+
+
+def _extend(state: Mapping[str, Any], **changes: Any) -> ChainMap:
+    """Layer ``changes`` over ``state`` without copying it."""
+    if isinstance(state, ChainMap):
+        return state.new_child(changes)
+    return ChainMap(changes, state)
+
+
+def extract_functions(state: Mapping[str, Any], tools: ToolRegistry) -> NodeResult:
+    functions = list(scan_code(state.get("code", ""))["functions"])
+    new_state = _extend(state, functions=functions, function_count=len(functions))
     return NodeResult(state=new_state, log=f"Found {len(functions)} functions")
 
 
-def check_complexity(state: Dict[str, Any], tools: ToolRegistry) -> NodeResult:
-    complexity_score = 0.0
-    for fn in state.get("functions", []):
-        complexity_score += min(1.0, max(0.1, len(fn) / 10))
-    complexity_score = round(complexity_score / max(1, len(state.get("functions", []))), 2) if state.get("functions") else 0.1
-    new_state = dict(state)
-    new_state["complexity_score"] = complexity_score
+def check_complexity(state: Mapping[str, Any], tools: ToolRegistry) -> NodeResult:
+    functions = state.get("functions", [])
+    if functions:
+        total = sum(min(1.0, max(0.1, length / 10)) for length in map(len, functions))
+        complexity_score = round(total / len(functions), 2)
+    else:
+        complexity_score = 0.1
+    new_state = _extend(state, complexity_score=complexity_score)
     return NodeResult(state=new_state, log=f"Complexity score: {complexity_score}")
 
 
-def detect_issues(state: Dict[str, Any], tools: ToolRegistry) -> NodeResult:
+def detect_issues(state: Mapping[str, Any], tools: ToolRegistry) -> NodeResult:
     detect = tools.get("detect_smells")
     issues = detect(state.get("code", ""))
-    new_state = dict(state)
-    new_state["issues"] = issues
+    new_state = _extend(state, issues=issues)
     return NodeResult(state=new_state, log=f"Issues detected: {issues.get('issues', 0)}")
 
 
-def suggest_improvements(state: Dict[str, Any], tools: ToolRegistry) -> NodeResult:
+def suggest_improvements(state: Mapping[str, Any], tools: ToolRegistry) -> NodeResult:
     suggestions: List[str] = []
     complexity = state.get("complexity_score", 0)
     if complexity > 0.7:
@@ -47,12 +83,11 @@ def suggest_improvements(state: Dict[str, Any], tools: ToolRegistry) -> NodeResu
         suggestions.append("Address flagged code smells.")
     if not suggestions:
         suggestions.append("Looks good, minor refactors only.")
-    new_state = dict(state)
-    new_state.setdefault("suggestions", []).extend(suggestions)
+    new_state = _extend(state, suggestions=[*state.get("suggestions", []), *suggestions])
     return NodeResult(state=new_state, log=f"Added {len(suggestions)} suggestions")
 
 
-def check_quality(state: Dict[str, Any], tools: ToolRegistry) -> NodeResult:
+def check_quality(state: Mapping[str, Any], tools: ToolRegistry) -> NodeResult:
     threshold = state.get("quality_threshold", 0.7)
     max_loops = state.get("max_iterations", 3)
     iterations = state.get("iterations", 0) + 1
@@ -60,9 +95,7 @@ def check_quality(state: Dict[str, Any], tools: ToolRegistry) -> NodeResult:
     issues_count = state.get("issues", {}).get("issues", 0)
     complexity = state.get("complexity_score", 0)
     score = max(0.0, 1.0 - (0.2 * issues_count) - (0.3 * complexity))
-    new_state = dict(state)
-    new_state["quality_score"] = round(score, 2)
-    new_state["iterations"] = iterations
+    new_state = _extend(state, quality_score=round(score, 2), iterations=iterations)
 
     log = f"Quality score {new_state['quality_score']} (iteration {iterations})"
     if new_state["quality_score"] >= threshold or iterations >= max_loops:
@@ -78,3 +111,16 @@ NODE_LIBRARY = {
     "check_quality": check_quality,
 }
 
+# Nodes whose result depends only on the listed state keys, so the engine may
+# reuse a previous result when those match. Nodes reading ``code`` are left out:
+# keying on the source would cost as much as scanning it, and scan_code caches that.
+MEMOIZED_NODES = {
+    "check_complexity": ("functions",),
+    "suggest_improvements": ("complexity_score", "issues", "suggestions"),
+    "check_quality": ("quality_threshold", "max_iterations", "iterations", "issues", "complexity_score"),
+}
+
+# Nodes cheap enough to run directly on the event loop rather than in the
+# engine's thread pool.
+INLINE_NODES = frozenset({"check_complexity", "suggest_improvements", "check_quality"})
+
@@ -0,0 +1,62 @@
+import asyncio
+
+from app.engine.core import GraphEngine
+from app.main import tool_registry
+from app.workflows.code_review import INLINE_NODES, MEMOIZED_NODES, NODE_LIBRARY
+
+DEFAULT_EDGES = {
+    "extract_functions": ["check_complexity"],
+    "check_complexity": ["detect_issues"],
+    "detect_issues": ["suggest_improvements"],
+    "suggest_improvements": ["check_quality"],
+    "check_quality": [],
+}
+
+
+def _engine() -> GraphEngine:
+    return GraphEngine(
+        node_library=NODE_LIBRARY,
+        tool_registry=tool_registry,
+        memoized_nodes=MEMOIZED_NODES,
+        inline_nodes=INLINE_NODES,
+    )
+
+
+def test_memoized_node_replays_unchanged_writes():
+    async def scenario():
+        engine = _engine()
+        loop_id = await engine.register_graph(
+            nodes=["check_complexity", "check_quality", "suggest_improvements", "extract_functions"],
+            edges={
+                "check_complexity": ["check_quality"],
+                "suggest_improvements": ["extract_functions"],
+                "extract_functions": ["check_complexity"],
+            },
+            start_node="check_complexity",
+        )
+        default_id = await engine.register_graph(
+            nodes=list(NODE_LIBRARY), edges=DEFAULT_EDGES, start_node="extract_functions"
+        )
+        # The second check_complexity pass sees functions=[] and rewrites the same 0.1 score.
+        await engine.run_graph(loop_id, {"max_iterations": 2, "quality_threshold": 5})
+        return await engine.run_graph(default_id, {"code": "x = 1\n"})
+
+    run = asyncio.run(scenario())
+    assert run.current_state["complexity_score"] == 0.1
+    assert run.current_state["quality_score"] == 0.97
+
+
+def test_memoized_results_are_not_shared_between_runs():
+    async def scenario():
+        engine = _engine()
+        graph_id = await engine.register_graph(
+            nodes=list(NODE_LIBRARY), edges=DEFAULT_EDGES, start_node="extract_functions"
+        )
+        first = await engine.run_graph(graph_id, {"code": "def f():\n    pass  # TODO\n"})
+        second = await engine.run_graph(graph_id, {"code": "def f():\n    pass  # TODO\n"})
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.current_state == second.current_state
+    assert first.current_state["suggestions"] is not second.current_state["suggestions"]
+    assert first.current_state["quality_score"] == second.current_state["quality_score"]